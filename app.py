@@ -1,6 +1,9 @@
 import streamlit as st
+import diskcache
+import numpy as np
 import pandas as pd
 import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
 
 st.set_page_config(page_title="Macro × Markets", layout="wide")
@@ -34,26 +37,38 @@ with st.sidebar:
 
 
 st.subheader("Macro calendar (v1)")
+# Read the clock once per rerun and reuse the converted forms below
 today = date.today()
+now = datetime.now()
+today_ts = pd.Timestamp(today)
+now_np = np.datetime64(now)
 
 # You can edit these anytime. For MVP, hard-coding is totally fine.
-macro_events = [
-    {"date": today + timedelta(days=1), "event": "CPI (Inflation) release", "why": "Can move rates & growth stocks; affects valuations."},
-    {"date": today + timedelta(days=7), "event": "FOMC / Fed decision", "why": "Rate path + forward guidance; big driver of market regime."},
-    {"date": today + timedelta(days=14), "event": "Jobs report (NFP)", "why": "Labor tightness → inflation pressure → rate expectations."},
-]
-
-macro_df = pd.DataFrame(macro_events).sort_values("date")
-macro_df["date"] = pd.to_datetime(macro_df["date"])
+# Cached per day so reruns don't rebuild and re-sort the frame; only the
+# current day's frame is kept.
+@st.cache_data(max_entries=1)
+def build_macro_df(today: date):
+    macro_events = [
+        {"date": today + timedelta(days=1), "event": "CPI (Inflation) release", "why": "Can move rates & growth stocks; affects valuations."},
+        {"date": today + timedelta(days=7), "event": "FOMC / Fed decision", "why": "Rate path + forward guidance; big driver of market regime."},
+        {"date": today + timedelta(days=14), "event": "Jobs report (NFP)", "why": "Labor tightness → inflation pressure → rate expectations."},
+    ]
+    macro_df = pd.DataFrame(macro_events).sort_values("date").reset_index(drop=True)
+    macro_df["date"] = pd.to_datetime(macro_df["date"])
+    return macro_df
+
+macro_df = build_macro_df(today)
+# macro_df is already sorted by date, so the first row is the next event
+next_macro = macro_df.iloc[0]
+next_event = next_macro["event"]
 st.dataframe(macro_df, use_container_width=True, hide_index=True)
 
 # ---------- Earnings tracker ----------
 st.subheader("Company events (earnings)")
 st.caption("This pulls 'earnings date' from yfinance when available (it’s not perfect, but great for MVP).")
 
-def safe_earnings_date(ticker: str):
+def safe_earnings_date(t):
     try:
-        t = yf.Ticker(ticker)
         cal = t.calendar  # can be empty / inconsistent
         if isinstance(cal, pd.DataFrame) and not cal.empty:
             # common format: rows are fields, columns include 'Earnings Date'
@@ -62,35 +77,114 @@ def safe_earnings_date(ticker: str):
                 # sometimes it’s a list/tuple of dates
                 if isinstance(val, (list, tuple)) and len(val) > 0:
                     val = val[0]
-                return pd.to_datetime(val)
+                # the date in the value's own timezone, as a plain ISO string
+                # so cached values stay simple types
+                return pd.Timestamp(val).date().isoformat()
     except Exception:
         return None
     return None
 
-rows = []
-for tic in st.session_state.watchlist:
-    ed = safe_earnings_date(tic)
-    rows.append({
-        "ticker": tic,
-        "earnings_date": ed.date().isoformat() if ed is not None else None,
-        "days_until": (ed.date() - today).days if ed is not None else None
+def get_sector(t):
+    try:
+        # .info is the heavy fundamentals payload; fetch it once and keep only the sector
+        return t.get_info().get("sector")
+    except Exception:
+        return None
+
+# On-disk store shared by every worker process; survives restarts/redeploys
+DISK_CACHE_TTL = 86400
+
+@st.cache_resource
+def disk_cache():
+    return diskcache.Cache(".yf_cache")
+
+# The disk cache is best-effort: a locked/corrupt store or an entry that no
+# longer unpickles is treated as a miss (or a skipped write), never an error
+def disk_get(key):
+    try:
+        return disk_cache().get(key)
+    except Exception:
+        return None
+
+def disk_set(key, value):
+    try:
+        disk_cache().set(key, value, expire=DISK_CACHE_TTL)
+    except Exception:
+        pass
+
+# One Ticker per symbol serves both the earnings and exposure tables.
+# Cached for an hour so widget reruns don't re-hit Yahoo for every ticker,
+# backed by the disk cache so a fresh process starts warm.
+@st.cache_data(ttl=3600, show_spinner=False)
+def lookup_ticker(ticker: str):
+    result = {"ticker": ticker}
+    t = None
+    # Each field is persisted under its own key and only once it was found, so a
+    # transient failure on one endpoint isn't pinned for a whole day
+    for field, fetch in (("earnings_date", safe_earnings_date), ("sector", get_sector)):
+        value = disk_get((field, ticker))
+        if value is None:
+            if t is None:
+                t = yf.Ticker(ticker)
+            value = fetch(t)
+            if value is not None:
+                disk_set((field, ticker), value)
+        result[field] = value
+    return result
+
+# yfinance calls are blocking HTTP round-trips, so overlap them across tickers
+MAX_FETCH_WORKERS = 16
+
+def fetch_all(fn, tickers):
+    if not tickers:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(tickers))) as pool:
+        return list(pool.map(fn, tickers))
+
+# Fetch each distinct ticker once, then map results back onto the watchlist order
+unique_tickers = list(dict.fromkeys(st.session_state.watchlist))
+lookup_by_ticker = dict(zip(unique_tickers, fetch_all(lookup_ticker, unique_tickers)))
+lookups = [lookup_by_ticker[tic] for tic in st.session_state.watchlist]
+
+# Large watchlists: only send one page of rows to the browser per rerun
+TABLE_PAGE_SIZE = 25
+
+def show_table(df, key: str):
+    if len(df) > TABLE_PAGE_SIZE:
+        n_pages = -(-len(df) // TABLE_PAGE_SIZE)
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1, key=key)
+        st.caption(f"Page {page} of {n_pages} ({len(df)} rows)")
+        df = df.iloc[(page - 1) * TABLE_PAGE_SIZE : page * TABLE_PAGE_SIZE]
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+# Build the frames column-wise from the lookups (schema is known up front).
+# With an empty watchlist the ticker-driven frames are skipped entirely.
+tickers_out = [lk["ticker"] for lk in lookups]
+
+if st.session_state.watchlist:
+    earn_df = pd.DataFrame({
+        "ticker": tickers_out,
+        "earnings_date": pd.to_datetime([lk["earnings_date"] for lk in lookups], format="ISO8601"),
     })
+    earn_df["days_until"] = (earn_df["earnings_date"] - today_ts).dt.days
+    earn_df = earn_df.sort_values(["earnings_date", "ticker"], na_position="last")
+    show_table(earn_df.assign(earnings_date=earn_df["earnings_date"].dt.date), key="earn_page")
 
-earn_df = pd.DataFrame(rows).sort_values(["earnings_date", "ticker"], na_position="last")
-st.dataframe(earn_df, use_container_width=True, hide_index=True)
+    # Earnings in the next 7 days, shared by the alerts, memo and vibe panel
+    upcoming_earn = earn_df.dropna(subset=["days_until"]).query("0 <= days_until <= 7")
+    soon_earn_tickers = upcoming_earn["ticker"].tolist()
+else:
+    st.info("Add tickers to your watchlist to track their earnings dates.")
+    soon_earn_tickers = []
 # ---------- ALERTS ----------
 st.subheader("Alerts")
 
-now = datetime.now()
+# Macro alerts: next 48 hours (computed on the raw datetime64 buffer, no frame copy)
+hours_until = (macro_df["date"].values.astype("datetime64[ns]") - now_np) / np.timedelta64(1, "h")
+soon_macro_idx = np.flatnonzero((hours_until >= 0) & (hours_until <= 48))
 
-# Macro alerts: next 48 hours
-macro_df_alert = macro_df.copy()
-macro_df_alert["hours_until"] = (macro_df_alert["date"] - pd.Timestamp(now)) / pd.Timedelta(hours=1)
-
-soon_macro = macro_df_alert[(macro_df_alert["hours_until"] >= 0) & (macro_df_alert["hours_until"] <= 48)]
-
-if len(soon_macro) > 0:
-    top = soon_macro.iloc[0]
+if soon_macro_idx.size:
+    top = macro_df.iloc[soon_macro_idx[0]]
     st.error(
         f"🚨 **Macro in the next 48 hours:** {top['event']} on **{top['date'].date().isoformat()}** — {top['why']}"
     )
@@ -98,11 +192,8 @@ else:
    st.success("✅ **Clear macro window:** no major releases in the next 48 hours. Volatility risk from macro is low.")
 
 # Earnings alerts: next 7 days
-earn_df_alert = earn_df.dropna(subset=["days_until"]).copy()
-soon_earn_7d = earn_df_alert[(earn_df_alert["days_until"] >= 0) & (earn_df_alert["days_until"] <= 7)]
-
-if len(soon_earn_7d) > 0:
-    tickers = ", ".join(soon_earn_7d["ticker"].tolist())
+if soon_earn_tickers:
+    tickers = ", ".join(soon_earn_tickers)
     st.warning(f"🟡 **Earnings in the next 7 days (watchlist):** {tickers}")
 else:
     st.info("ℹ️ No watchlist earnings in the next 7 days (based on available earnings dates).")
@@ -112,50 +203,44 @@ st.subheader("Exposure & interpretation")
 
 # 1) Sector -> macro sensitivity mapping (edit anytime)
 sector_to_tags = {
-    "Technology": ["rate-sensitive", "growth"],
-    "Communication Services": ["rate-sensitive", "growth"],
-    "Consumer Discretionary": ["cyclical", "rate-sensitive"],
-    "Financial Services": ["rate-sensitive", "macro-sensitive"],
-    "Real Estate": ["rate-sensitive"],
-    "Utilities": ["defensive", "rate-sensitive"],
-    "Consumer Staples": ["defensive", "inflation-sensitive"],
-    "Health Care": ["defensive"],
-    "Industrials": ["cyclical"],
-    "Energy": ["inflation-sensitive", "commodities"],
-    "Basic Materials": ["inflation-sensitive", "commodities"],
+    "Technology": ("rate-sensitive", "growth"),
+    "Communication Services": ("rate-sensitive", "growth"),
+    "Consumer Discretionary": ("cyclical", "rate-sensitive"),
+    "Financial Services": ("rate-sensitive", "macro-sensitive"),
+    "Real Estate": ("rate-sensitive",),
+    "Utilities": ("defensive", "rate-sensitive"),
+    "Consumer Staples": ("defensive", "inflation-sensitive"),
+    "Health Care": ("defensive",),
+    "Industrials": ("cyclical",),
+    "Energy": ("inflation-sensitive", "commodities"),
+    "Basic Materials": ("inflation-sensitive", "commodities"),
 }
+unknown_tags = ("unknown",)
+# Display labels joined once up front instead of per ticker
+sector_to_tag_label = {sector: ", ".join(tags) for sector, tags in sector_to_tags.items()}
 
-def get_sector(ticker: str):
-    try:
-        info = yf.Ticker(ticker).info
-        return info.get("sector")
-    except Exception:
-        return None
-
-# 2) Build an exposure table
-ex_rows = []
-for tic in st.session_state.watchlist:
-    sector = get_sector(tic)
-    tags = sector_to_tags.get(sector, ["unknown"]) if sector else ["unknown"]
-    ex_rows.append({"ticker": tic, "sector": sector, "tags": ", ".join(tags)})
-
-ex_df = pd.DataFrame(ex_rows)
+if st.session_state.watchlist:
+    # 2) Build an exposure table
+    sectors_out = [lk["sector"] for lk in lookups]
+    tags_out = [sector_to_tags.get(sector, unknown_tags) for sector in sectors_out]
+    tag_labels_out = [sector_to_tag_label.get(sector, "unknown") for sector in sectors_out]
 
-st.dataframe(ex_df, use_container_width=True, hide_index=True)
+    ex_df = pd.DataFrame({"ticker": tickers_out, "sector": sectors_out, "tags": tags_out})
 
-# 3) Summarize concentration in tags
-all_tags = []
-for t in ex_df["tags"].fillna("unknown"):
-    all_tags.extend([x.strip() for x in t.split(",")])
+    # tags stay as tuples in ex_df; the pre-joined labels are only for display
+    show_table(ex_df.assign(tags=tag_labels_out), key="ex_page")
 
-tag_counts = pd.Series(all_tags).value_counts()
+    # 3) Summarize concentration in tags
+    tag_counts = ex_df["tags"].explode().value_counts()
 
-top_tag = tag_counts.index[0] if len(tag_counts) else "unknown"
-top_share = (tag_counts.iloc[0] / max(len(st.session_state.watchlist), 1)) if len(tag_counts) else 0
+    top_tag = tag_counts.index[0] if len(tag_counts) else "unknown"
+    top_share = (tag_counts.iloc[0] / max(len(st.session_state.watchlist), 1)) if len(tag_counts) else 0
+else:
+    st.info("Add tickers to your watchlist to see their sector exposure.")
+    top_tag = "unknown"
+    top_share = 0
 
 # 4) Tie it to the next macro event
-next_event = macro_df.sort_values("date").iloc[0]["event"]
-
 if top_tag == "rate-sensitive":
     st.info(f"🧠 **Interpretation:** Your watchlist leans **rate-sensitive** (~{top_share:.0%}). If **{next_event}** surprises hotter/hawkish, expect higher volatility—especially in growth names.")
 elif top_tag == "cyclical":
@@ -172,9 +257,6 @@ st.subheader("Weekly memo")
 tone = st.selectbox("Tone", ["Base", "Bull", "Bear"], index=0)
 
 
-next_macro = macro_df.sort_values("date").iloc[0]
-macro_name = next_macro["event"]
-
 # exposure language
 if top_tag == "rate-sensitive":
     exposure_line = "Your watchlist leans toward rate-sensitive, growth-oriented names."
@@ -188,50 +270,47 @@ else:
     exposure_line = "Your watchlist has mixed exposure across sectors."
 
 # earnings language
-if len(soon_earn_7d) > 0:
-    earn_line = f"Earnings to watch this week include {', '.join(soon_earn_7d['ticker'].tolist())}."
+if soon_earn_tickers:
+    earn_line = f"Earnings to watch this week include {', '.join(soon_earn_tickers)}."
 else:
     earn_line = "There are no major watchlist earnings scheduled in the coming week."
 
 # ----- tone-aware memo text -----
+# The opener is the only markdown part, so it is rendered twice (bold for the
+# page, plain for the copy box) instead of stripping "**" from the full memo.
 if tone == "Bull":
-    opener = f"This week’s key macro focus is **{macro_name}**—a potential tailwind if it comes in supportive for risk sentiment."
+    opener = "This week’s key macro focus is {focus}—a potential tailwind if it comes in supportive for risk sentiment."
     closer = "Net: the setup looks constructive if the data validates the current narrative, with upside led by rate-sensitive names."
 elif tone == "Bear":
-    opener = f"This week’s key macro focus is **{macro_name}**—a key risk if it surprises against expectations."
+    opener = "This week’s key macro focus is {focus}—a key risk if it surprises against expectations."
     closer = "Net: caution is warranted; adverse macro outcomes could drive downside volatility, particularly in rate-sensitive sectors."
 else:  # Base
-    opener = f"This week’s key macro focus is **{macro_name}**, which may influence rate expectations and broader risk sentiment."
+    opener = "This week’s key macro focus is {focus}, which may influence rate expectations and broader risk sentiment."
     closer = "Net: macro data is likely to be the primary near-term driver, with market reactions hinging on surprises versus expectations."
 
-memo_text = (
-    f"{opener} "
-    f"{exposure_line} "
-    f"{earn_line} "
-    f"{closer}"
-)
+opener_md = opener.format(focus=f"**{next_event}**")
+opener_plain = opener.format(focus=next_event)
+
+memo_text = " ".join((opener_md, exposure_line, earn_line, closer))
+memo_plain = " ".join((opener_plain, exposure_line, earn_line, closer))
 st.markdown(memo_text)
 
 st.text_area(
     "Copy memo",
-    memo_text.replace("**", ""),
+    memo_plain,
     height=150
 )
   
    
 # ---------- Quick “why it matters” vibe panel ----------
 st.subheader("This week: what should you care about?")
-next_macro = macro_df.iloc[0]
 st.write(
     f"**Next macro event:** {next_macro['event']} on **{next_macro['date'].date().isoformat()}** — {next_macro['why']}"
 )
 
-soon_earn = earn_df.dropna(subset=["days_until"])
-soon_earn = soon_earn[(soon_earn["days_until"] >= 0) & (soon_earn["days_until"] <= 7)]
-
-if len(soon_earn) > 0:
+if soon_earn_tickers:
     st.write("**Earnings in the next 7 days (watchlist):**")
-    st.write(", ".join(soon_earn["ticker"].tolist()))
+    st.write(", ".join(soon_earn_tickers))
 else:
     st.write("**No watchlist earnings in the next 7 days** (based on available data).")
 